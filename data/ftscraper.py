@@ -1,18 +1,31 @@
 import asyncio
-import json
 import os
+import random
+import re
 import time
+from collections.abc import Sequence
 from datetime import datetime, timedelta
 from typing import Union
 
 import aiohttp
+import orjson
+import zstandard
 from aiolimiter import AsyncLimiter
-from pydantic import BaseModel, TypeAdapter
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 
 # region Pydantic Models
 
 
-class Player(BaseModel):
+class FantraxModel(BaseModel):
+    """
+    Base model for (parts of) Fantrax API responses. These are never modified once loaded, so they're frozen, and any
+    fields we don't model are dropped rather than stored.
+    """
+
+    model_config = ConfigDict(frozen=True, extra='ignore')
+
+
+class Player(FantraxModel):
     """
     Model representing the structure of the API response for getPlayerIds,
     as returned by an HTTP get to: https://www.fantrax.com/fxea/general/getPlayerIds?sport=MLB
@@ -29,87 +42,87 @@ class Player(BaseModel):
     sportRadarId: str | None = None
 
 
-class FantraxTeam(BaseModel):
+class FantraxTeam(FantraxModel):
     name: str
     id: str
     shortName: str
 
 
-class Bye(BaseModel):
+class Bye(FantraxModel):
     bye: bool = True
 
 
 TeamOrBye = Union[FantraxTeam, Bye]
 
 
-class Matchup(BaseModel):
+class Matchup(FantraxModel):
     away: TeamOrBye
     home: TeamOrBye
 
 
-class MatchupPeriod(BaseModel):
+class MatchupPeriod(FantraxModel):
     period: int
     matchupList: list[Matchup]
 
 
-class PositionConstraint(BaseModel):
+class PositionConstraint(FantraxModel):
     maxActive: int
 
 
-class RosterInfo(BaseModel):
+class RosterInfo(FantraxModel):
     positionConstraints: dict[str, PositionConstraint]
     maxTotalPlayers: int
     maxTotalActivePlayers: int
 
 
-class PlayerInfo(BaseModel):
+class PlayerInfo(FantraxModel):
     eligiblePos: str
     status: str
 
 
-class DraftSettings(BaseModel):
+class DraftSettings(FantraxModel):
     draftType: str
 
 
-class PoolSettings(BaseModel):
+class PoolSettings(FantraxModel):
     duplicatePlayerType: str
     playerSourceType: str
 
 
-class TeamInfo(BaseModel):
+class TeamInfo(FantraxModel):
     name: str
     id: str
 
 
-class ScoringCategoryDetails(BaseModel):
+class ScoringCategoryDetails(FantraxModel):
     Default: str
 
 
-class ScoringDetails(BaseModel):
+class ScoringDetails(FantraxModel):
     code: str
     name: str
     id: str
     shortName: str
 
 
-class ScoringConfig(BaseModel):
+class ScoringConfig(FantraxModel):
     weight: float
     position: ScoringDetails
     scoringCategory: ScoringDetails
 
 
-class ScoringCategorySetting(BaseModel):
+class ScoringCategorySetting(FantraxModel):
     configs: list[ScoringConfig]
     group: ScoringDetails
 
 
-class ScoringSystem(BaseModel):
+class ScoringSystem(FantraxModel):
     scoringCategories: dict[str, dict[str, ScoringCategoryDetails]]
     scoringCategorySettings: list[ScoringCategorySetting]
     type: str
 
 
-class LeagueInfo(BaseModel):
+class LeagueInfo(FantraxModel):
     """
     Model representing the structure of the API response for getLeagueInfo,
     as returned by an HTTP get to: https://www.fantrax.com/fxea/general/getLeagueInfo?leagueId=<league_id>
@@ -136,13 +149,19 @@ class LeagueInfo(BaseModel):
     def has_league_ended(self) -> bool:
         """Utility function for checking if a league has ended (based on the end date in the league info)."""
 
+        return self.has_end_date_passed(self.endDate)
+
+    @staticmethod
+    def has_end_date_passed(end_date_str: str) -> bool:
+        """Utility function for checking if a league end date has passed, usable on raw data without building the model."""
+
         # Convert the end date string to a datetime object.
-        end_date = datetime.strptime(self.endDate, '%Y-%m-%d')
+        end_date = datetime.fromisoformat(end_date_str)
         # Check if the current date is past the end date, plus one day to account for any late updates.
         return datetime.now() > end_date + timedelta(days=1)
 
 
-class TeamStandings(BaseModel):
+class TeamStandings(FantraxModel):
     """
     Model representing the structure of the API response for getStandings,
     as returned by an HTTP get to: https://www.fantrax.com/fxea/general/getStandings?leagueId=<league_id>
@@ -156,7 +175,7 @@ class TeamStandings(BaseModel):
     winPercentage: float
 
 
-class DraftPick(BaseModel):
+class DraftPick(FantraxModel):
     pick: int
     round: int
     pickInRound: int
@@ -166,7 +185,7 @@ class DraftPick(BaseModel):
     time: int
 
 
-class Draft(BaseModel):
+class Draft(FantraxModel):
     """
     Model representing the structure of the API response for getDraftResults,
     as returned by an HTTP get to: https://www.fantrax.com/fxea/general/getDraftResults?leagueId=<league_id>
@@ -210,7 +229,7 @@ class FBDLeague(BaseModel):
 
 # endregion
 
-_knownLeagues = [
+_knownLeagues: tuple[str, ...] = (
     # 2026
     '13kc5gwkmm7vhodw',  # Champs League
     'pugo59rhmm9vjmkz',  # Andrew Dawson League
@@ -267,28 +286,108 @@ _knownLeagues = [
     # 'h0nia07fkmedpvk2',  # Griffey League
     # '6qy7dqwakmici8im',  # Ichiro League
     # 'i8a6jclykmefo93i',  # Pujols League
-]
-_ft_session = None
+)
+_league_info_cache_dir = 'data/.cache/league_info'
+_end_date_pattern = re.compile(rb'"endDate":\s*"([^"]*)"')
+_player_data_adapter = TypeAdapter(dict[str, Player])
+_league_standings_adapter = TypeAdapter(list[TeamStandings])
+_ft_session: aiohttp.ClientSession | None = None
+_ft_session_lock = asyncio.Lock()
 _rate_limiter = AsyncLimiter(5, 1)  # Limit to 5 requests per second.
+# Limit to 5 requests in flight (matching the connection pool), so requests never queue for a connection once their
+# timeout has started.
+_request_sem = asyncio.Semaphore(5)
+_request_timeout = aiohttp.ClientTimeout(total=10)
+_zstd_compressor = zstandard.ZstdCompressor(level=3)
+_default_headers = {
+    'accept': 'application/json',
+    'Content-Type': 'application/json',
+}
+_retriable_statuses = {429, 503}  # Fantrax responds with these when it's overloaded, so they're worth retrying.
+# In-memory copies of already-loaded data, so repeat calls within one run don't reparse anything from disk.
+_player_data: dict[str, Player] | None = None
+_player_data_lock = asyncio.Lock()
+# League info is keyed by league ID, alongside the mtime of the cache file it was loaded from.
+_league_info_memo: dict[str, tuple[float, LeagueInfo]] = {}
 
 
 def _is_cache_file_too_old(filepath: str, max_age_seconds: int = 86400) -> bool:
     """Utility function for checking if a cache file is too old (default is >1 day)."""
 
-    if not os.path.exists(filepath):
+    try:
+        file_mod_time = os.stat(filepath).st_mtime
+    except OSError:
         return True
-    file_mod_time = os.path.getmtime(filepath)
-    current_time = time.time()
-    return (current_time - file_mod_time) > max_age_seconds
+    return _is_cache_mtime_too_old(file_mod_time, max_age_seconds)
+
+
+def _is_cache_mtime_too_old(file_mod_time: float | None, max_age_seconds: int = 86400) -> bool:
+    """Utility function for checking if a cache file with the given last modified time (None if missing) is too old."""
+    return file_mod_time is None or (time.time() - file_mod_time) > max_age_seconds
+
+
+def _scan_cache_dir(dirpath: str) -> dict[str, float]:
+    """Utility function for getting the last modified time of every file in a cache directory with one directory scan."""
+
+    try:
+        with os.scandir(dirpath) as entries:
+            return {entry.name: entry.stat().st_mtime for entry in entries if entry.is_file()}
+    except FileNotFoundError:
+        return {}
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Utility function for lazily creating the shared Fantrax API session, so connections are reused across calls."""
+
+    global _ft_session
+    async with _ft_session_lock:
+        if _ft_session is None or _ft_session.closed:
+            _ft_session = aiohttp.ClientSession(
+                'https://www.fantrax.com',
+                # Every request goes to the same host, so keep a small pool of keep-alive connections warm for reuse.
+                connector=aiohttp.TCPConnector(limit=5, limit_per_host=5, keepalive_timeout=30, ttl_dns_cache=300),
+            )
+    return _ft_session
+
+
+def _read_cache_file(filepath: str) -> bytes:
+    """Utility function for reading a cache file, decompressing it first if it's zstd-compressed (.zst)."""
+
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    if filepath.endswith('.zst'):
+        # Decompressors aren't safe to share between threads, and cache files are read from worker threads.
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+async def _read_cache_file_async(filepath: str) -> bytes:
+    """Utility function for reading a cache file on a worker thread, so it doesn't block the event loop."""
+    return await asyncio.to_thread(_read_cache_file, filepath)
 
 
 def _dump_to_cache_file(data, filepath: str):
-    """Utility function for writing data to a cache file, ensuring the file's last modified time is updated to now."""
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=2)
-    # Update the file's last modified time to now to make sure it's not considered old.
-    # This is necessary because if the new API response is the same as the cached file contents, the file's last modified time won't be updated.
-    os.utime(filepath, (time.time(), time.time()))
+    """
+    Utility function for writing data to a cache file. Data that is already serialized (bytes) is written as-is, and
+    compressed with zstd if the cache file is a .zst file.
+    The data is written to a temporary file that then replaces the cache file, so a crash mid-write can't leave a
+    partially-written cache file behind.
+    """
+    if not isinstance(data, bytes):
+        data = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    if filepath.endswith('.zst'):
+        data = _zstd_compressor.compress(data)
+
+    tmp_filepath = f'{filepath}.tmp'
+    try:
+        with open(tmp_filepath, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        # Don't leave a partial temporary file lying around in the cache directory.
+        if os.path.exists(tmp_filepath):
+            os.unlink(tmp_filepath)
+        raise
 
 
 def _consolidate_league_data(
@@ -324,62 +423,74 @@ def _consolidate_league_data(
     return league_data
 
 
-async def _fantrax_api_request(url: str, method: str, headers: dict = {}, params: dict = {}) -> dict:
+async def _fantrax_api_request(url: str, method: str, headers: dict | None = None, params: dict | None = None) -> dict:
     """Utility function for querying the Fantrax API with a rate-limiter attached to avoid spamming requests."""
 
-    global _ft_session
-    _ft_session = aiohttp.ClientSession('https://www.fantrax.com')
-
     if not headers:
-        headers = {
-            'accept': 'application/json',
-            'Content-Type': 'application/json',
-        }
+        headers = _default_headers
+    method = method.upper()
 
-    async with _ft_session as api:
-        retry_count = 0
-        max_retries = 3
+    api = await _get_session()
+    max_retries = 3
 
-        while retry_count < max_retries:
-            try:
-                async with _rate_limiter:
-                    print(f'Sending request - ({method.upper()} to {url})')
-                    resp = await api.request(
-                        method.upper(), url, headers=headers, params=params, timeout=aiohttp.ClientTimeout(total=10)
-                    )
-                json_resp = await resp.json(content_type=resp.content_type)
-                # Fantrax sometimes returns errors with response code 200...
-                if 'error' in json_resp:
-                    raise Exception(f'Fantrax API error: {json_resp["error"]}')
-                return json_resp
-            except asyncio.TimeoutError:
-                # Retry requests that time out... Fantrax can be very finicky and slow, so we don't want to assume our first requests work.
-                retry_count += 1
-            except Exception as e:
-                raise Exception(f'Fantrax API request failed: {e}')
-        # If we reach here, all retries have failed.
-        raise Exception(f'Fantrax API request ({method.upper()} for {url}) timed out after multiple retries.')
+    for retry_count in range(max_retries):
+        if retry_count:
+            # Back off exponentially (with some jitter so retries don't all land at once) to give Fantrax time to recover.
+            await asyncio.sleep(min(2**retry_count + random.random() * 0.25, 8))
+        try:
+            # Only hold a request slot while sending the request and reading the body back, so the backoff between
+            # retries of one slow request never holds up any of the others. The timeout only starts once the slot is held,
+            # and the rate-limiter then meters how often requests actually start.
+            async with _request_sem:
+                await _rate_limiter.acquire()
+                print(f'Sending request - ({method} to {url})')
+                async with api.request(method, url, headers=headers, params=params, timeout=_request_timeout) as resp:
+                    if resp.status in _retriable_statuses:
+                        continue
+                    body = await resp.read()
+            json_resp = orjson.loads(body)
+        except asyncio.TimeoutError:
+            # Retry requests that time out... Fantrax can be very finicky and slow, so we don't want to assume our first requests work.
+            continue
+        except Exception as e:
+            raise Exception(f'Fantrax API request failed: {e}')
+
+        # Fantrax sometimes returns errors with response code 200...
+        if 'error' in json_resp:
+            raise Exception(f'Fantrax API request failed: Fantrax API error: {json_resp["error"]}')
+        return json_resp
+    # If we reach here, all retries have failed.
+    raise Exception(f'Fantrax API request ({method} for {url}) timed out or was throttled after multiple retries.')
 
 
 async def request_player_data() -> dict[str, Player]:
-    player_data_adapter = TypeAdapter(dict[str, Player])
+    global _player_data
+
+    # Player data doesn't change over the life of the process, so only load it once (failed loads are retried next call).
+    async with _player_data_lock:
+        if not _player_data:
+            _player_data = await _load_player_data()
+        return _player_data
 
-    if not _is_cache_file_too_old('data/.cache/player_data.json'):
-        with open('data/.cache/player_data.json', 'r') as f:
-            try:
-                player_data = json.load(f)
-                player_data = player_data_adapter.validate_python(player_data)
-                print('Using cached player data.')
-                return player_data
-            except Exception:
-                pass
+
+async def _load_player_data() -> dict[str, Player]:
+    """Utility function for getting the player data, from its cache file if possible and the API if not."""
+
+    player_info_cache_file = 'data/.cache/player_data.json.zst'
+    if not _is_cache_file_too_old(player_info_cache_file):
+        try:
+            player_data = _player_data_adapter.validate_json(await _read_cache_file_async(player_info_cache_file))
+            print('Using cached player data.')
+            return player_data
+        except Exception:
+            pass
 
     url = '/fxea/general/getPlayerIds?sport=MLB'
-    player_info_cache_file = 'data/.cache/player_data.json'
     try:
         resp = await _fantrax_api_request(url, 'GET')
-        _dump_to_cache_file(resp, player_info_cache_file)
-        player_data = player_data_adapter.validate_python(resp)
+        player_data = _player_data_adapter.validate_python(resp)
+        # Serialize straight from the validated models in a single pass, rather than dumping them to dicts first.
+        _dump_to_cache_file(_player_data_adapter.dump_json(player_data), player_info_cache_file)
 
         return player_data
     except Exception as e:
@@ -387,59 +498,93 @@ async def request_player_data() -> dict[str, Player]:
         return {}
 
 
-async def request_league_info(league_ids: list[str]) -> dict[str, LeagueInfo]:
-    league_info_results = {}
+async def _request_single_league_info(league_id: str, cache_mtime: float | None) -> LeagueInfo | None:
+    """
+    Utility function for getting the league info for one league, from its cache file if possible and the API if not.
+    The cache file's last modified time (None if it doesn't exist) comes from the caller's scan of the cache directory.
+    """
 
-    info_requests = {}
-    for league_id in league_ids:
-        league_info_cache_file = f'data/.cache/league_info/league_info_{league_id}.json'
+    league_info_cache_file = f'{_league_info_cache_dir}/league_info_{league_id}.json.zst'
+    if cache_mtime is not None:
         try:
-            with open(league_info_cache_file, 'r') as f:
-                league_info = LeagueInfo.model_validate(json.load(f))
-                # Load from cache in two cases: if the cache file is not too old, or if the league has already ended (and we don't expect it to change).
-                if not _is_cache_file_too_old(league_info_cache_file) or league_info.has_league_ended():
-                    print(f'Using cached league info for {league_id}.')
-                    league_info_results[league_id] = league_info
-                    continue
-        except Exception:
-            pass
-
-        url = f'/fxea/general/getLeagueInfo?leagueId={league_id}'
-        info_requests[league_id] = _fantrax_api_request(url, 'GET')
-
-    if info_requests:
-        responses = await asyncio.gather(*info_requests.values(), return_exceptions=True)
-        for league_id, resp in zip(info_requests.keys(), responses):
-            league_info_cache_file = f'data/.cache/league_info/league_info_{league_id}.json'
-            try:
-                _dump_to_cache_file(resp, league_info_cache_file)
-                league_info_results[league_id] = LeagueInfo.model_validate(resp)
-            except Exception as e:
-                print(f'Error fetching league info for {league_id}: {e}')
+            cache_is_fresh = not _is_cache_mtime_too_old(cache_mtime)
+            memo = _league_info_memo.get(league_id)
+            # Reuse what was already loaded from this cache file, unless the file has been rewritten since.
+            if memo is not None and memo[0] == cache_mtime:
+                league_info = memo[1]
+                league_ended = league_info.has_league_ended()
+            else:
+                league_info = None
+                raw_league_info = await _read_cache_file_async(league_info_cache_file)
+                # Peek at the end date without parsing the whole file, so stale active leagues (which are about to be
+                # refetched) are never parsed or validated at all.
+                end_date_match = _end_date_pattern.search(raw_league_info)
+                league_ended = end_date_match is not None and LeagueInfo.has_end_date_passed(
+                    end_date_match.group(1).decode()
+                )
+            # Load from cache in two cases: if the cache file is not too old, or if the league has already ended (and we don't expect it to change).
+            if cache_is_fresh or league_ended:
+                if league_info is None:
+                    league_info = LeagueInfo.model_validate_json(raw_league_info)
+                    _league_info_memo[league_id] = (cache_mtime, league_info)
+                print(f'Using cached league info for {league_id}.')
+                return league_info
+        except Exception as e:
+            print(f'Ignoring unreadable league info cache for {league_id}: {e}')
+
+    # Anything not served from the cache (missing, stale, or unreadable) falls through to the API.
+    url = f'/fxea/general/getLeagueInfo?leagueId={league_id}'
+    try:
+        resp = await _fantrax_api_request(url, 'GET')
+        # Only cache responses that validate, so a bad response never replaces a good cache file.
+        league_info = LeagueInfo.model_validate(resp)
+        _dump_to_cache_file(league_info.model_dump_json().encode(), league_info_cache_file)
+    except Exception as e:
+        print(f'Error fetching league info for {league_id}: {e}')
+        return None
 
-    return league_info_results
+    # Remember what was just cached; if the new cache file can't be stat-ed, it'll simply be reloaded next time instead.
+    try:
+        _league_info_memo[league_id] = (os.path.getmtime(league_info_cache_file), league_info)
+    except OSError:
+        pass
+    return league_info
+
+
+async def request_league_info(league_ids: Sequence[str]) -> dict[str, LeagueInfo]:
+    # Scan the cache directory once up front, rather than checking each league's cache file separately.
+    cache_mtimes = _scan_cache_dir(_league_info_cache_dir)
+
+    # Cache reads and API requests for every league are all in flight together, and each league is validated and written
+    # to its cache file as soon as it lands, rather than after every other league has finished too.
+    async with asyncio.TaskGroup() as tg:
+        tasks = {
+            league_id: tg.create_task(
+                _request_single_league_info(league_id, cache_mtimes.get(f'league_info_{league_id}.json.zst'))
+            )
+            for league_id in league_ids
+        }
+    return {league_id: info for league_id, task in tasks.items() if (info := task.result()) is not None}
 
 
 async def request_league_standings(
-    league_ids: list[str], league_info: dict[str, LeagueInfo]
+    league_ids: Sequence[str], league_info: dict[str, LeagueInfo]
 ) -> dict[str, list[TeamStandings]]:
-    league_standings_adapter = TypeAdapter(list[TeamStandings])
     league_standings_results = {}
 
     standings_requests = {}
     for league_id in league_ids:
         league_standings_cache_file = f'data/.cache/league_standings/league_standings_{league_id}.json'
         try:
-            with open(league_standings_cache_file, 'r') as f:
-                league_standings = json.load(f)
-                # Load from cache in two cases: if the cache file is not too old, or if the league has already ended (and we don't expect it to change).
-                if not _is_cache_file_too_old(league_standings_cache_file) or (
-                    league_id in league_info and league_info[league_id].has_league_ended()
-                ):
-                    print(f'Using cached league standings for {league_id}.')
-                    league_standings = league_standings_adapter.validate_python(league_standings)
-                    league_standings_results[league_id] = league_standings
-                    continue
+            # Load from cache in two cases: if the cache file is not too old, or if the league has already ended (and we don't expect it to change).
+            if not _is_cache_file_too_old(league_standings_cache_file) or (
+                league_id in league_info and league_info[league_id].has_league_ended()
+            ):
+                with open(league_standings_cache_file, 'rb') as f:
+                    league_standings = _league_standings_adapter.validate_json(f.read())
+                print(f'Using cached league standings for {league_id}.')
+                league_standings_results[league_id] = league_standings
+                continue
         except Exception:
             pass
 
@@ -452,22 +597,24 @@ async def request_league_standings(
             league_standings_cache_file = f'data/.cache/league_standings/league_standings_{league_id}.json'
             try:
                 _dump_to_cache_file(resp, league_standings_cache_file)
-                league_standings_results[league_id] = league_standings_adapter.validate_python(resp)
+                league_standings_results[league_id] = _league_standings_adapter.validate_python(resp)
             except Exception as e:
                 print(f'Error fetching league standings for {league_id}: {e}')
 
     return league_standings_results
 
 
-async def request_league_draft_results(league_ids: list[str], league_info: dict[str, LeagueInfo]) -> dict[str, Draft]:
+async def request_league_draft_results(
+    league_ids: Sequence[str], league_info: dict[str, LeagueInfo]
+) -> dict[str, Draft]:
     draft_results = {}
 
     draft_requests = {}
     for league_id in league_ids:
         league_draft_results_cache_file = f'data/.cache/draft_results/draft_results_{league_id}.json'
         try:
-            with open(league_draft_results_cache_file, 'r') as f:
-                league_draft_results = Draft.model_validate(json.load(f))
+            with open(league_draft_results_cache_file, 'rb') as f:
+                league_draft_results = Draft.model_validate_json(f.read())
                 # Load from cache in three cases: if the cache file is not too old, if the league has already ended, or if the draft has completed.
                 if (
                     not _is_cache_file_too_old(league_draft_results_cache_file)
@@ -516,13 +663,11 @@ async def main():
 
         league_data = _consolidate_league_data(league_info, league_standings, league_draft_results)
         for league_id, league in league_data.items():
-            with open(f'data/leagues/fbd_league_{league_id}.json', 'w') as f:
-                json.dump(league.model_dump(), f, indent=2)
-
-    except Exception as e:
+            with open(f'data/leagues/fbd_league_{league_id}.json', 'wb') as f:
+                f.write(orjson.dumps(league.model_dump(), option=orjson.OPT_INDENT_2))
+    finally:
         if _ft_session is not None:
             await _ft_session.close()
-        raise e
 
 
 if __name__ == '__main__':